@@ -9,10 +9,37 @@ import pandas as pd
 from typing import Dict
 import logging
 
+from dtype_utils import optimize_dtypes
+from time_features import hour_and_day_of_week
+
+try:
+    import polars as pl
+
+    HAS_POLARS = True
+except ImportError:  # pragma: no cover - fallback for environments without polars
+    HAS_POLARS = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    HAS_PYARROW = True
+except ImportError:  # pragma: no cover - parquet/feather export requires pyarrow
+    HAS_PYARROW = False
+
 
 class HealthDataMerger:
     """Merges Apple Health and Freestyle Libre glucose data."""
 
+    # Low-cardinality string columns stored dictionary-encoded in Parquet
+    PARQUET_DICTIONARY_COLUMNS = [
+        "type",
+        "sourceName",
+        "glucose_range",
+        "glucose_trend",
+    ]
+
     def __init__(self):
         """Initialize the data merger."""
         self.apple_health_data = None
@@ -23,20 +50,26 @@ class HealthDataMerger:
         """
         Load Apple Health data for merging.
 
+        The frame is stored by reference; the caller must not mutate it
+        while the merger is in use.
+
         Args:
             data (pd.DataFrame): Processed Apple Health data
         """
-        self.apple_health_data = data.copy()
+        self.apple_health_data = data
         logging.info(f"Loaded {len(data)} Apple Health records")
 
     def load_glucose_data(self, data: pd.DataFrame) -> None:
         """
         Load glucose data for merging.
 
+        The frame is stored by reference; the caller must not mutate it
+        while the merger is in use.
+
         Args:
             data (pd.DataFrame): Processed glucose data
         """
-        self.glucose_data = data.copy()
+        self.glucose_data = data
         logging.info(f"Loaded {len(data)} glucose records")
 
     def align_timestamps(self, tolerance_minutes: int = 15) -> pd.DataFrame:
@@ -52,18 +85,133 @@ class HealthDataMerger:
         if self.apple_health_data is None or self.glucose_data is None:
             raise ValueError("Both datasets must be loaded before merging")
 
+        if "startDate" not in self.apple_health_data.columns:
+            raise ValueError("Apple Health data must have startDate column")
+
+        if HAS_POLARS:
+            merged_df = self._align_with_polars(tolerance_minutes)
+        else:
+            merged_df = self._align_with_pandas(tolerance_minutes)
+
+        merged_df = optimize_dtypes(merged_df)
+        self.merged_data = merged_df
+
+        logging.info(f"Merged data contains {len(merged_df)} aligned records")
+        return merged_df
+
+    def _align_with_polars(self, tolerance_minutes: int) -> pd.DataFrame:
+        """
+        Nearest-timestamp join using Polars join_asof.
+
+        Args:
+            tolerance_minutes (int): Maximum time difference for matching records
+
+        Returns:
+            pd.DataFrame: Merged dataset
+        """
+        glucose = (
+            pl.from_pandas(self.glucose_data, rechunk=False)
+            .rename({"timestamp": "glucose_timestamp"})
+            .sort("glucose_timestamp", maintain_order=True)
+        )
+        health = (
+            pl.from_pandas(self.apple_health_data, rechunk=False)
+            .rename({"startDate": "health_timestamp"})
+            .sort("health_timestamp", maintain_order=True)
+        )
+        tolerance = f"{tolerance_minutes}m"
+
+        # strategy="nearest" resolves a record exactly between two readings
+        # to the later one, while pd.merge_asof keeps the earlier one. Find
+        # both neighbours and only take the next reading if it is strictly
+        # closer, so both paths produce the same matches.
+        glucose_times = glucose.select("glucose_timestamp")
+        previous_gap = pl.col("health_timestamp") - pl.col("previous_timestamp")
+        next_gap = pl.col("next_timestamp") - pl.col("health_timestamp")
+
+        matched = (
+            health.join_asof(
+                glucose_times.rename({"glucose_timestamp": "previous_timestamp"}),
+                left_on="health_timestamp",
+                right_on="previous_timestamp",
+                strategy="backward",
+                tolerance=tolerance,
+            )
+            .join_asof(
+                glucose_times.rename({"glucose_timestamp": "next_timestamp"}),
+                left_on="health_timestamp",
+                right_on="next_timestamp",
+                strategy="forward",
+                tolerance=tolerance,
+            )
+            .with_columns(
+                pl.when(pl.col("next_timestamp").is_null() | (previous_gap <= next_gap))
+                .then(pl.col("previous_timestamp"))
+                .otherwise(pl.col("next_timestamp"))
+                .alias("matched_timestamp")
+            )
+            # Remove records where no glucose match was found
+            .drop_nulls("matched_timestamp")
+            .drop(["previous_timestamp", "next_timestamp"])
+            # Nearest matches are non-decreasing in health_timestamp
+            .set_sorted("matched_timestamp")
+        )
+
+        merged = (
+            matched.join_asof(
+                glucose,
+                left_on="matched_timestamp",
+                right_on="glucose_timestamp",
+                strategy="backward",
+            )
+            .drop("matched_timestamp")
+            # Calculate time difference between matched records
+            .with_columns(
+                (
+                    (pl.col("health_timestamp") - pl.col("glucose_timestamp"))
+                    .dt.total_microseconds()
+                    / 60_000_000
+                ).alias("time_diff_minutes")
+            )
+        )
+
+        merged_df = merged.to_pandas(use_pyarrow_extension_array=False)
+
+        # The Polars round trip loses pandas-only dtype details such as the
+        # category order and nullable integers, so restore the source dtypes
+        for source in (self.glucose_data, self.apple_health_data):
+            for col, dtype in source.dtypes.items():
+                if col not in merged_df.columns:
+                    continue
+                if isinstance(dtype, pd.CategoricalDtype):
+                    # astype is a no-op between unordered categoricals with
+                    # the same categories, even when their order differs
+                    merged_df[col] = pd.Categorical(merged_df[col], dtype=dtype)
+                elif merged_df[col].dtype != dtype:
+                    merged_df[col] = merged_df[col].astype(dtype)
+
+        return merged_df
+
+    def _align_with_pandas(self, tolerance_minutes: int) -> pd.DataFrame:
+        """
+        Nearest-timestamp join using pd.merge_asof.
+
+        Args:
+            tolerance_minutes (int): Maximum time difference for matching records
+
+        Returns:
+            pd.DataFrame: Merged dataset
+        """
         # Prepare glucose data
-        glucose_df = self.glucose_data.copy()
-        glucose_df = glucose_df.rename(columns={"timestamp": "glucose_timestamp"})
+        glucose_df = self.glucose_data.rename(
+            columns={"timestamp": "glucose_timestamp"}
+        )
 
         # Prepare Apple Health data - use startDate as primary timestamp
-        health_df = self.apple_health_data.copy()
-        if "startDate" in health_df.columns:
-            health_df = health_df.rename(columns={"startDate": "health_timestamp"})
-        else:
-            raise ValueError("Apple Health data must have startDate column")
+        health_df = self.apple_health_data.rename(
+            columns={"startDate": "health_timestamp"}
+        )
 
-        # Create time-based merge using pd.merge_asof
         # Sort both dataframes by timestamp
         glucose_df = glucose_df.sort_values("glucose_timestamp")
         health_df = health_df.sort_values("health_timestamp")
@@ -88,9 +236,6 @@ class HealthDataMerger:
             merged_df["health_timestamp"] - merged_df["glucose_timestamp"]
         ).dt.total_seconds() / 60
 
-        self.merged_data = merged_df
-
-        logging.info(f"Merged data contains {len(merged_df)} aligned records")
         return merged_df
 
     def create_time_windows(self, window_minutes: int = 60) -> pd.DataFrame:
@@ -106,13 +251,11 @@ class HealthDataMerger:
         if self.merged_data is None:
             raise ValueError("Data must be merged before creating time windows")
 
-        df = self.merged_data.copy()
-
         # Use glucose timestamp as the primary time reference
-        df.set_index("glucose_timestamp", inplace=True)
+        df = self.merged_data.set_index("glucose_timestamp")
 
         # Create time windows
-        window_freq = f"{window_minutes}T"
+        window_freq = f"{window_minutes}min"
 
         # Aggregate numeric columns
         numeric_cols = df.select_dtypes(include=["number"]).columns
@@ -132,13 +275,12 @@ class HealthDataMerger:
         windowed_data.columns = ["_".join(col).strip() for col in windowed_data.columns]
 
         # Add categorical data (most frequent value in window)
+        window_grouper = pd.Grouper(freq=window_freq)
         categorical_cols = ["type", "glucose_range", "glucose_trend", "sourceName"]
         for col in categorical_cols:
             if col in df.columns:
-                windowed_data[f"{col}_mode"] = (
-                    df[col]
-                    .resample(window_freq)
-                    .agg(lambda x: x.mode().iloc[0] if len(x.mode()) > 0 else None)
+                windowed_data[f"{col}_mode"] = self._window_mode(
+                    df[col].astype("category"), window_grouper
                 )
 
         # Remove windows with no glucose data
@@ -149,6 +291,33 @@ class HealthDataMerger:
         logging.info(f"Created {len(windowed_data)} time windows")
         return windowed_data
 
+    @staticmethod
+    def _window_mode(values: pd.Series, window_grouper: pd.Grouper) -> pd.Series:
+        """
+        Most frequent value of a categorical series within each time window.
+
+        Ties resolve to the first category, matching Series.mode().
+
+        Args:
+            values (pd.Series): Categorical series with a DatetimeIndex
+            window_grouper (pd.Grouper): Time grouper defining the windows
+
+        Returns:
+            pd.Series: Mode per window, indexed by window start
+        """
+        # Counts ordered by window, then category, so a stable sort on the
+        # counts keeps the first category among ties
+        counts = values.groupby([window_grouper, values], observed=True).size()
+        counts = counts.sort_values(ascending=False, kind="stable")
+
+        # Cython groupby-first picks the top value per window
+        top_values = pd.Series(
+            counts.index.get_level_values(1),
+            index=counts.index.get_level_values(0),
+            name=values.name,
+        )
+        return top_values.groupby(level=0).first()
+
     def add_contextual_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Add contextual features based on timing and patterns.
@@ -170,19 +339,22 @@ class HealthDataMerger:
             logging.warning("No timestamp column found for feature engineering")
             return df
 
-        df["hour"] = df[timestamp_col].dt.hour
-        df["day_of_week"] = df[timestamp_col].dt.dayofweek
-        df["is_weekend"] = df["day_of_week"].isin([5, 6])
-        df["is_night"] = df["hour"].between(22, 6)
-        df["is_morning"] = df["hour"].between(6, 12)
-        df["is_afternoon"] = df["hour"].between(12, 18)
-        df["is_evening"] = df["hour"].between(18, 22)
+        hours, days = hour_and_day_of_week(df[timestamp_col])
+
+        df["hour"] = hours
+        df["day_of_week"] = days
+        df["is_weekend"] = days >= 5
+        # Night wraps around midnight, so it cannot be expressed as a single range
+        df["is_night"] = (hours >= 22) | (hours < 6)
+        df["is_morning"] = (hours >= 6) & (hours <= 12)
+        df["is_afternoon"] = (hours >= 12) & (hours <= 18)
+        df["is_evening"] = (hours >= 18) & (hours <= 22)
 
         # Meal timing approximation
         df["likely_meal_time"] = (
-            df["hour"].between(7, 9)  # Breakfast
-            | df["hour"].between(12, 14)  # Lunch
-            | df["hour"].between(18, 20)  # Dinner
+            ((hours >= 7) & (hours <= 9))  # Breakfast
+            | ((hours >= 12) & (hours <= 14))  # Lunch
+            | ((hours >= 18) & (hours <= 20))  # Dinner
         )
 
         return df
@@ -197,43 +369,68 @@ class HealthDataMerger:
         if self.merged_data is None:
             raise ValueError("Data must be merged before correlation analysis")
 
-        df = self.merged_data.copy()
+        df = self.merged_data
 
-        # Select numeric columns for correlation
-        numeric_cols = df.select_dtypes(include=["number"]).columns
+        if "glucose_value" not in df.columns:
+            return {}
 
-        correlations = {}
+        # Select numeric columns with enough observations for correlation
+        numeric_df = df.select_dtypes(include=["number"])
+        numeric_df = numeric_df.loc[:, numeric_df.notna().sum() > 10]
 
-        if "glucose_value" in df.columns:
-            for col in numeric_cols:
-                if col != "glucose_value" and df[col].notna().sum() > 10:
-                    corr = df["glucose_value"].corr(df[col])
-                    if not pd.isna(corr):
-                        correlations[col] = corr
+        corrs = (
+            numeric_df.drop(columns="glucose_value", errors="ignore")
+            .corrwith(df["glucose_value"], method="pearson")
+            .dropna()
+        )
 
         # Sort by absolute correlation strength
-        correlations = dict(
-            sorted(correlations.items(), key=lambda x: abs(x[1]), reverse=True)
-        )
+        correlations = corrs.reindex(
+            corrs.abs().sort_values(ascending=False).index
+        ).to_dict()
 
         return correlations
 
-    def export_merged_data(self, file_path: str, format_type: str = "csv") -> None:
+    def export_merged_data(self, file_path: str, format_type: str = "parquet") -> None:
         """
         Export merged data to file.
 
+        Parquet output is zstd-compressed with per-row-group statistics so
+        readers can skip row groups by timestamp range.
+
         Args:
             file_path (str): Path to save the file
-            format_type (str): Format type ('csv', 'parquet', 'json')
+            format_type (str): Format type ('parquet', 'feather', 'csv', 'json')
         """
         if self.merged_data is None:
             raise ValueError("No merged data to export")
 
-        if format_type.lower() == "csv":
+        format_type = format_type.lower()
+
+        if format_type in ("parquet", "feather") and not HAS_PYARROW:
+            raise ImportError(f"pyarrow is required for {format_type} export")
+
+        if format_type == "parquet":
+            table = pa.Table.from_pandas(self.merged_data, preserve_index=False)
+            pq.write_table(
+                table,
+                file_path,
+                compression="zstd",
+                compression_level=3,
+                row_group_size=64_000,
+                use_dictionary=[
+                    col
+                    for col in self.PARQUET_DICTIONARY_COLUMNS
+                    if col in table.column_names
+                ],
+                write_statistics=True,
+            )
+        elif format_type == "feather":
+            table = pa.Table.from_pandas(self.merged_data, preserve_index=False)
+            feather.write_feather(table, file_path, compression="zstd")
+        elif format_type == "csv":
             self.merged_data.to_csv(file_path, index=False)
-        elif format_type.lower() == "parquet":
-            self.merged_data.to_parquet(file_path, index=False)
-        elif format_type.lower() == "json":
+        elif format_type == "json":
             self.merged_data.to_json(file_path, orient="records", date_format="iso")
         else:
             raise ValueError(f"Unsupported format: {format_type}")
@@ -5,15 +5,62 @@ This module parses Apple Health XML export files and extracts relevant health me
 including glucose readings, activity data, sleep data, and other physiological measurements.
 """
 
-import xml.etree.ElementTree as ET
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
 import pandas as pd
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 import logging
 
+try:
+    import pyarrow as pa
+
+    HAS_PYARROW = True
+except ImportError:  # pragma: no cover - fallback for environments without pyarrow
+    HAS_PYARROW = False
+
+try:
+    import lxml.etree as ET
+except ImportError:  # pragma: no cover - fallback for environments without lxml
+    import xml.etree.ElementTree as ET
+
 
 class AppleHealthParser:
     """Parser for Apple Health XML export data."""
 
+    RECORD_COLUMNS = [
+        "type",
+        "sourceName",
+        "value",
+        "unit",
+        "creationDate",
+        "startDate",
+        "endDate",
+    ]
+
+    # Exports at least this large are parsed in parallel by default
+    PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+    # Low-cardinality attributes stored as integer codes while parsing
+    DICTIONARY_COLUMNS = {"type", "sourceName", "workoutActivityType"}
+
+    WORKOUT_COLUMNS = [
+        "workoutActivityType",
+        "duration",
+        "durationUnit",
+        "totalDistance",
+        "totalDistanceUnit",
+        "totalEnergyBurned",
+        "totalEnergyBurnedUnit",
+        "sourceName",
+        "creationDate",
+        "startDate",
+        "endDate",
+    ]
+
     def __init__(self, xml_file_path: str):
         """
         Initialize the parser with the path to the Apple Health XML file.
@@ -22,29 +69,40 @@ class AppleHealthParser:
             xml_file_path (str): Path to the Apple Health export.xml file
         """
         self.xml_file_path = xml_file_path
-        self.tree = None
-        self.root = None
+        self.root_tag = None
 
     def load_xml(self) -> bool:
         """
-        Load and parse the XML file.
+        Verify that the XML file exists and looks like a complete export.
+
+        Only the root start tag and the end of the file are read, so a
+        truncated export (missing its closing root tag) is caught without a
+        full parse. Other malformed markup is reported when records are first
+        streamed by the extract methods.
 
         Returns:
             bool: True if successful, False otherwise
         """
         try:
-            self.tree = ET.parse(self.xml_file_path)
-            self.root = self.tree.getroot()
+            with open(self.xml_file_path, "rb") as xml_file:
+                _, root = next(ET.iterparse(xml_file, events=("start",)))
+                root_tag = root.tag
+
+                xml_file.seek(0, os.SEEK_END)
+                xml_file.seek(max(xml_file.tell() - 1024, 0))
+                tail = xml_file.read().rstrip()
+
+            if not tail.endswith(f"</{root_tag}>".encode()):
+                self._log_parse_error(
+                    ValueError(f"Missing closing </{root_tag}> tag at end of file")
+                )
+                return False
+
+            self.root_tag = root_tag
             logging.info(f"Successfully loaded XML file: {self.xml_file_path}")
             return True
         except ET.ParseError as e:
-            logging.error(f"Error parsing XML file: {e}")
-            logging.error(
-                "This is likely due to a corrupted or incomplete Apple Health export."
-            )
-            logging.error(
-                "Apple Health XML files can be very large and may get truncated during export."
-            )
+            self._log_parse_error(e)
             return False
         except FileNotFoundError:
             logging.error(f"XML file not found: {self.xml_file_path}")
@@ -53,56 +111,360 @@ class AppleHealthParser:
             logging.error(f"Unexpected error loading XML file: {e}")
             return False
 
+    def _log_parse_error(self, error: Exception) -> None:
+        """Log a parse error along with the usual cause for Apple Health exports."""
+        logging.error(f"Error parsing XML file: {error}")
+        logging.error(
+            "This is likely due to a corrupted or incomplete Apple Health export."
+        )
+        logging.error(
+            "Apple Health XML files can be very large and may get truncated during export."
+        )
+
+    def _iter_elements(self, tag: str) -> Iterator:
+        """
+        Stream elements with the given tag from the XML file.
+
+        Each element is yielded once fully parsed and then released, so memory
+        use stays flat regardless of export size.
+
+        Args:
+            tag (str): Element tag to yield (e.g. 'Record', 'Workout')
+
+        Yields:
+            Element: Parsed element; only valid until the next iteration
+        """
+        if self.root_tag is None:
+            raise ValueError("XML file not loaded. Call load_xml() first.")
+
+        try:
+            yield from self._stream_elements(self.xml_file_path, tag)
+        except ET.ParseError as e:
+            self._log_parse_error(e)
+            raise
+
+    @staticmethod
+    def _stream_elements(source, tag: Optional[str]) -> Iterator:
+        """
+        Stream elements with the given tag from a path or binary file object.
+
+        Matching elements are yielded at any depth (e.g. Records nested in a
+        Correlation). Each child of the root is released once it has been
+        fully parsed, so memory use stays flat regardless of export size.
+
+        Args:
+            source: Path or binary file object to parse
+            tag (Optional[str]): Element tag to yield; None parses the whole
+                document without yielding anything
+
+        Yields:
+            Element: Parsed element; only valid until the next iteration
+        """
+        root = None
+        depth = 0
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+
+            depth -= 1
+            if elem.tag == tag:
+                yield elem
+            if depth == 1:
+                # A top-level element is complete and any nested matches
+                # have been yielded; drop it without touching siblings the
+                # parser may already be building ahead of the current event
+                elem.clear()
+                root.remove(elem)
+
+    def _extract_frame(
+        self,
+        tag: str,
+        column_names: List[str],
+        wanted_types: Optional[Set[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Collect attributes of streamed elements into a DataFrame.
+
+        Attributes in DICTIONARY_COLUMNS are dictionary-encoded as they are
+        read, so each distinct string is stored once.
+
+        Args:
+            tag (str): Element tag to extract
+            column_names (List[str]): Attributes to collect, in column order
+            wanted_types (Set[str], optional): Keep only elements whose
+                                             'type' attribute is in this set
+
+        Returns:
+            pd.DataFrame: DataFrame with one column per attribute
+        """
+        columns, lookups = self._collect_columns(
+            self._iter_elements(tag), column_names, wanted_types
+        )
+        return self._build_frame(columns, lookups)
+
+    @classmethod
+    def _collect_columns(
+        cls,
+        elements: Iterator,
+        column_names: List[str],
+        wanted_types: Optional[Set[str]] = None,
+    ) -> Tuple[Dict[str, list], Dict[str, Dict[Optional[str], int]]]:
+        """
+        Gather element attributes into per-column lists.
+
+        Args:
+            elements (Iterator): Streamed elements
+            column_names (List[str]): Attributes to collect, in column order
+            wanted_types (Set[str], optional): Keep only elements whose
+                                             'type' attribute is in this set
+
+        Returns:
+            Tuple: Column lists and the value-to-code lookup of each
+                dictionary-encoded column
+        """
+        # Each lookup maps value -> code; None is pre-seeded as the null code
+        lookups = {
+            col: {None: -1} for col in column_names if col in cls.DICTIONARY_COLUMNS
+        }
+        columns = {col: [] for col in column_names}
+
+        for elem in elements:
+            attrib = elem.attrib
+
+            # Filter by record types if specified
+            if wanted_types is not None and attrib.get("type") not in wanted_types:
+                continue
+
+            for col, values in columns.items():
+                value = attrib.get(col)
+                lookup = lookups.get(col)
+                if lookup is not None:
+                    value = lookup.setdefault(value, len(lookup) - 1)
+                values.append(value)
+
+        return columns, lookups
+
+    @staticmethod
+    def _build_frame(
+        columns: Dict[str, list], lookups: Dict[str, Dict[Optional[str], int]]
+    ) -> pd.DataFrame:
+        """
+        Build a DataFrame from column-oriented attribute lists.
+
+        With pyarrow the columns go through an Arrow table whose buffers are
+        released as pandas takes them over, avoiding a second full copy.
+        Dictionary-encoded columns become categoricals.
+
+        Args:
+            columns (Dict[str, list]): Attribute values (or codes) by column
+            lookups (Dict[str, Dict[Optional[str], int]]): Value-to-code
+                                                         mapping per encoded column
+
+        Returns:
+            pd.DataFrame: DataFrame with one column per attribute
+        """
+        if HAS_PYARROW:
+            table = AppleHealthParser._build_table(columns, lookups)
+            return table.to_pandas(self_destruct=True, split_blocks=True)
+
+        data = {}
+        for col, values in columns.items():
+            if col in lookups:
+                # Insertion order matches code order; skip the None entry
+                values = pd.Categorical.from_codes(
+                    np.asarray(values, dtype=np.int32), list(lookups[col])[1:]
+                )
+            data[col] = values
+        return pd.DataFrame(data)
+
+    @staticmethod
+    def _build_table(
+        columns: Dict[str, list], lookups: Dict[str, Dict[Optional[str], int]]
+    ) -> "pa.Table":
+        """
+        Build an Arrow table from column-oriented attribute lists.
+
+        The column lists are released once converted.
+
+        Args:
+            columns (Dict[str, list]): Attribute values (or codes) by column
+            lookups (Dict[str, Dict[Optional[str], int]]): Value-to-code
+                                                         mapping per encoded column
+
+        Returns:
+            pa.Table: Table with string and dictionary columns
+        """
+        arrays = {}
+        for col, values in columns.items():
+            if col in lookups:
+                codes = np.asarray(values, dtype=np.int32)
+                # Insertion order matches code order; skip the None entry
+                arrays[col] = pa.DictionaryArray.from_arrays(
+                    pa.array(codes, mask=codes < 0),
+                    pa.array(list(lookups[col])[1:], type=pa.string()),
+                )
+            else:
+                arrays[col] = pa.array(values, type=pa.string())
+        columns.clear()
+
+        return pa.table(arrays)
+
+    @staticmethod
+    def _convert_dates(df: pd.DataFrame) -> None:
+        """Convert Apple Health date columns to datetime in place."""
+        for col in ["creationDate", "startDate", "endDate"]:
+            if col in df.columns:
+                df[col] = pd.to_datetime(
+                    df[col], errors="coerce", format="ISO8601", cache=True
+                )
+
     def extract_health_records(
-        self, record_types: Optional[List[str]] = None
+        self, record_types: Optional[List[str]] = None, n_jobs: Optional[int] = None
     ) -> pd.DataFrame:
         """
         Extract health records from the XML file.
 
+        Each call streams the whole export. To get several record categories,
+        extract all records once and pass them to the get_*_data methods.
+
         Args:
             record_types (List[str], optional): Specific record types to extract.
                                               If None, extracts all records.
+            n_jobs (int, optional): Worker processes for parsing. If None, uses
+                                  all cores for exports larger than
+                                  PARALLEL_MIN_BYTES; 1 parses serially.
 
         Returns:
             pd.DataFrame: DataFrame containing health records
         """
-        if self.root is None:
+        if self.root_tag is None:
             raise ValueError("XML file not loaded. Call load_xml() first.")
 
-        records = []
+        wanted_types = set(record_types) if record_types else None
 
-        for record in self.root.findall(".//Record"):
-            record_type = record.get("type")
+        if n_jobs is None:
+            large_file = os.path.getsize(self.xml_file_path) >= self.PARALLEL_MIN_BYTES
+            n_jobs = (os.cpu_count() or 1) if large_file else 1
 
-            # Filter by record types if specified
-            if record_types and record_type not in record_types:
-                continue
+        chunks = self._record_chunk_offsets(n_jobs) if n_jobs > 1 else []
 
-            record_data = {
-                "type": record_type,
-                "sourceName": record.get("sourceName"),
-                "value": record.get("value"),
-                "unit": record.get("unit"),
-                "creationDate": record.get("creationDate"),
-                "startDate": record.get("startDate"),
-                "endDate": record.get("endDate"),
-            }
-            records.append(record_data)
-
-        df = pd.DataFrame(records)
+        if len(chunks) > 1:
+            df = self._extract_records_parallel(chunks, wanted_types)
+        else:
+            df = self._extract_frame("Record", self.RECORD_COLUMNS, wanted_types)
 
         # Convert date columns to datetime
-        date_columns = ["creationDate", "startDate", "endDate"]
-        for col in date_columns:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
+        self._convert_dates(df)
 
         # Convert value column to numeric where possible
-        if "value" in df.columns:
-            df["value"] = pd.to_numeric(df["value"], errors="coerce")
+        df["value"] = pd.to_numeric(df["value"], errors="coerce")
 
         return df
 
+    def _record_chunk_offsets(self, n_chunks: int) -> List[Tuple[int, int]]:
+        """
+        Split the children of the export's root into byte ranges.
+
+        Records are a long flat run of siblings, so cutting at top-level record
+        starts leaves every range a sequence of complete elements that can be
+        parsed on its own. Chunked parsing needs pyarrow, and the file must end
+        with </HealthData> so truncated exports still go through the serial
+        parser and its errors.
+
+        Args:
+            n_chunks (int): Desired number of ranges
+
+        Returns:
+            List[Tuple[int, int]]: (start, end) byte offsets; empty if the file
+                cannot be split
+        """
+        if not HAS_PYARROW:
+            return []
+
+        with open(self.xml_file_path, "rb") as xml_file, mmap.mmap(
+            xml_file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            # The first range takes everything after the root start tag, so
+            # Records in a leading Correlation are not skipped
+            root = mm.find(b"<HealthData")
+            first = mm.find(b">", root) + 1 if root >= 0 else -1
+            end = mm.rfind(b"</HealthData>")
+            if first <= 0 or end < first:
+                return []
+
+            step = (end - first) // n_chunks
+            starts = [first]
+            for i in range(1, n_chunks):
+                start = self._find_top_level_record(mm, first + i * step, end)
+                if start < 0:
+                    break
+                if start > starts[-1]:
+                    starts.append(start)
+
+        return list(zip(starts, starts[1:] + [end]))
+
+    @staticmethod
+    def _find_top_level_record(mm: mmap.mmap, pos: int, end: int) -> int:
+        """
+        Find the first <Record> tag at or after pos that is a child of the root.
+
+        In Apple Health exports Records are only nested inside <Correlation>
+        elements (e.g. blood pressure pairs), so a candidate is skipped when the
+        nearest preceding <Correlation> tag has not been closed yet.
+
+        Args:
+            mm (mmap.mmap): Memory-mapped export
+            pos (int): Offset to search from
+            end (int): Offset to stop searching at
+
+        Returns:
+            int: Offset of the tag, or -1 if there is none before end
+        """
+        while True:
+            start = mm.find(b"<Record ", pos, end)
+            if start < 0:
+                return -1
+
+            opened = mm.rfind(b"<Correlation ", 0, start)
+            closed = mm.rfind(b"</Correlation>", 0, start)
+            if opened <= closed:
+                return start
+
+            pos = mm.find(b"</Correlation>", start, end)
+            if pos < 0:
+                return -1
+
+    def _extract_records_parallel(
+        self, chunks: List[Tuple[int, int]], wanted_types: Optional[Set[str]]
+    ) -> pd.DataFrame:
+        """
+        Parse record byte ranges in worker processes and combine the results.
+
+        Args:
+            chunks (List[Tuple[int, int]]): (start, end) byte offsets
+            wanted_types (Set[str], optional): Record types to keep
+
+        Returns:
+            pd.DataFrame: Records in file order
+        """
+        starts, ends = zip(*chunks)
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            tables = list(
+                pool.map(
+                    _parse_record_chunk,
+                    repeat(self.xml_file_path),
+                    starts,
+                    ends,
+                    repeat(wanted_types),
+                )
+            )
+
+        table = pa.concat_tables(tables)
+        return table.to_pandas(self_destruct=True, split_blocks=True)
+
     def extract_workouts(self) -> pd.DataFrame:
         """
         Extract workout data from the XML file.
@@ -110,47 +472,28 @@ class AppleHealthParser:
         Returns:
             pd.DataFrame: DataFrame containing workout records
         """
-        if self.root is None:
-            raise ValueError("XML file not loaded. Call load_xml() first.")
-
-        workouts = []
-
-        for workout in self.root.findall(".//Workout"):
-            workout_data = {
-                "workoutActivityType": workout.get("workoutActivityType"),
-                "duration": workout.get("duration"),
-                "durationUnit": workout.get("durationUnit"),
-                "totalDistance": workout.get("totalDistance"),
-                "totalDistanceUnit": workout.get("totalDistanceUnit"),
-                "totalEnergyBurned": workout.get("totalEnergyBurned"),
-                "totalEnergyBurnedUnit": workout.get("totalEnergyBurnedUnit"),
-                "sourceName": workout.get("sourceName"),
-                "creationDate": workout.get("creationDate"),
-                "startDate": workout.get("startDate"),
-                "endDate": workout.get("endDate"),
-            }
-            workouts.append(workout_data)
-
-        df = pd.DataFrame(workouts)
+        df = self._extract_frame("Workout", self.WORKOUT_COLUMNS)
 
         # Convert date columns to datetime
-        date_columns = ["creationDate", "startDate", "endDate"]
-        for col in date_columns:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
+        self._convert_dates(df)
 
         # Convert numeric columns
         numeric_columns = ["duration", "totalDistance", "totalEnergyBurned"]
         for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors="coerce")
+            df[col] = pd.to_numeric(df[col], errors="coerce")
 
         return df
 
-    def get_glucose_data(self) -> pd.DataFrame:
+    def get_glucose_data(
+        self, records: Optional[pd.DataFrame] = None
+    ) -> pd.DataFrame:
         """
         Extract glucose-related data from Apple Health.
 
+        Args:
+            records (pd.DataFrame, optional): Output of extract_health_records()
+                to filter. If None, the export is streamed again.
+
         Returns:
             pd.DataFrame: DataFrame containing glucose measurements
         """
@@ -159,13 +502,19 @@ class AppleHealthParser:
             "HKCategoryTypeIdentifierInsulinDelivery",
         ]
 
-        glucose_df = self.extract_health_records(glucose_types)
+        glucose_df = self._select_records(glucose_types, records)
         return glucose_df
 
-    def get_activity_data(self) -> pd.DataFrame:
+    def get_activity_data(
+        self, records: Optional[pd.DataFrame] = None
+    ) -> pd.DataFrame:
         """
         Extract activity-related data from Apple Health.
 
+        Args:
+            records (pd.DataFrame, optional): Output of extract_health_records()
+                to filter. If None, the export is streamed again.
+
         Returns:
             pd.DataFrame: DataFrame containing activity measurements
         """
@@ -177,21 +526,131 @@ class AppleHealthParser:
             "HKQuantityTypeIdentifierFlightsClimbed",
         ]
 
-        activity_df = self.extract_health_records(activity_types)
+        activity_df = self._select_records(activity_types, records)
         return activity_df
 
-    def get_sleep_data(self) -> pd.DataFrame:
+    def get_sleep_data(
+        self, records: Optional[pd.DataFrame] = None
+    ) -> pd.DataFrame:
         """
         Extract sleep-related data from Apple Health.
 
+        Args:
+            records (pd.DataFrame, optional): Output of extract_health_records()
+                to filter. If None, the export is streamed again.
+
         Returns:
             pd.DataFrame: DataFrame containing sleep measurements
         """
         sleep_types = ["HKCategoryTypeIdentifierSleepAnalysis"]
 
-        sleep_df = self.extract_health_records(sleep_types)
+        sleep_df = self._select_records(sleep_types, records)
         return sleep_df
 
+    def _select_records(
+        self, record_types: List[str], records: Optional[pd.DataFrame]
+    ) -> pd.DataFrame:
+        """
+        Records of the given types, filtered from records when provided.
+
+        Args:
+            record_types (List[str]): Record types to keep
+            records (pd.DataFrame, optional): Output of extract_health_records()
+                to filter. If None, the export is streamed again.
+
+        Returns:
+            pd.DataFrame: Matching records, as extract_health_records returns them
+        """
+        if records is None:
+            return self.extract_health_records(record_types)
+
+        df = records[records["type"].isin(record_types)].reset_index(drop=True)
+        for col in self.DICTIONARY_COLUMNS.intersection(df.columns):
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].cat.remove_unused_categories()
+
+        return df
+
+
+class _RecordRangeReader:
+    """
+    Read-only file object over one byte range of an export, wrapped in a root.
+
+    Lets a worker stream its range straight from disk instead of holding a
+    wrapped copy of it in memory.
+    """
+
+    def __init__(self, xml_file, start: int, end: int):
+        """
+        Initialize the reader.
+
+        Args:
+            xml_file: Export opened in binary mode
+            start (int): Offset of the first byte in the range
+            end (int): Offset just past the range
+        """
+        xml_file.seek(start)
+        self.xml_file = xml_file
+        self.remaining = end - start
+        self.head = b"<HealthData>"
+        self.tail = b"</HealthData>"
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Read the opening root tag, then the range, then the closing root tag.
+
+        Args:
+            size (int): Maximum number of range bytes to return; -1 for no limit
+
+        Returns:
+            bytes: Next piece of the document; empty once exhausted
+        """
+        if self.head:
+            data, self.head = self.head, b""
+            return data
+
+        if self.remaining > 0:
+            if size is None or size < 0:
+                size = self.remaining
+            data = self.xml_file.read(min(size, self.remaining))
+            if data:
+                self.remaining -= len(data)
+                return data
+            self.remaining = 0
+
+        data, self.tail = self.tail, b""
+        return data
+
+
+def _parse_record_chunk(
+    xml_file_path: str, start: int, end: int, wanted_types: Optional[Set[str]]
+) -> "pa.Table":
+    """
+    Parse the <Record> elements in one byte range of an export.
+
+    Runs in a worker process. The range holds complete top-level elements
+    and is streamed from disk inside a synthetic root, so a bad split point
+    raises a parse error rather than losing records.
+
+    Args:
+        xml_file_path (str): Path to the Apple Health export.xml file
+        start (int): Offset of the first byte in the range
+        end (int): Offset just past the range
+        wanted_types (Set[str], optional): Record types to keep
+
+    Returns:
+        pa.Table: Records in the range
+    """
+    with open(xml_file_path, "rb") as xml_file:
+        columns, lookups = AppleHealthParser._collect_columns(
+            AppleHealthParser._stream_elements(
+                _RecordRangeReader(xml_file, start, end), "Record"
+            ),
+            AppleHealthParser.RECORD_COLUMNS,
+            wanted_types,
+        )
+    return AppleHealthParser._build_table(columns, lookups)
+
 
 if __name__ == "__main__":
     # Example usage
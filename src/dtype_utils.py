@@ -0,0 +1,43 @@
+"""
+DataFrame Dtype Helpers
+
+This module narrows the dtypes of processed and merged frames so downstream
+pandas operations and Parquet exports work on smaller columns.
+"""
+
+import pandas as pd
+
+FLOAT32_COLUMNS = ["glucose_value", "time_diff_minutes"]
+INT8_COLUMNS = ["hour", "day_of_week"]
+CATEGORY_COLUMNS = [
+    "type",
+    "sourceName",
+    "glucose_range",
+    "glucose_trend",
+    "glucose_source",
+]
+
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcast known columns to their narrowest suitable dtype in place.
+
+    Columns that are not present are skipped.
+
+    Args:
+        df (pd.DataFrame): DataFrame to optimize
+
+    Returns:
+        pd.DataFrame: The same DataFrame with narrowed dtypes
+    """
+    dtypes = {}
+    dtypes.update({col: "float32" for col in FLOAT32_COLUMNS})
+    dtypes.update({col: "int8" for col in INT8_COLUMNS})
+    dtypes.update({col: "category" for col in CATEGORY_COLUMNS})
+    dtypes.update({col: "bool" for col in df.columns if col.startswith("is_")})
+
+    for col, dtype in dtypes.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+
+    return df
@@ -5,14 +5,136 @@ This module processes CSV exports from Freestyle Libre 3 glucose monitoring syst
 and prepares the data for analysis and merging with Apple Health data.
 """
 
+import numpy as np
 import pandas as pd
-from typing import Dict
+from typing import Dict, List, Optional
 import logging
 
+from dtype_utils import optimize_dtypes
+from time_features import hour_and_day_of_week
+
+try:
+    from numba import njit
+
+    HAS_NUMBA = True
+except ImportError:  # pragma: no cover - fallback for environments without numba
+    HAS_NUMBA = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    HAS_PYARROW = True
+except ImportError:  # pragma: no cover - fallback for environments without pyarrow
+    HAS_PYARROW = False
+
+NS_PER_MINUTE = 60_000_000_000
+
+# Trend codes index into LibreGlucoseProcessor.TREND_CATEGORIES
+if HAS_NUMBA:
+
+    @njit(cache=True)
+    def _rate_and_trend(timestamps_ns: np.ndarray, glucose: np.ndarray):
+        """Rate of change (mg/dL per minute) and trend code in a single pass."""
+        n = glucose.shape[0]
+        rate = np.empty(n)
+        trend = np.full(n, 2, np.int8)
+        if n == 0:
+            return rate, trend
+        rate[0] = np.nan
+        for i in range(1, n):
+            minutes = (timestamps_ns[i] - timestamps_ns[i - 1]) / NS_PER_MINUTE
+            r = (glucose[i] - glucose[i - 1]) / minutes if minutes > 0 else np.nan
+            rate[i] = r
+            if r > 2:
+                trend[i] = 4
+            elif r >= 1:
+                trend[i] = 3
+            elif r < -2:
+                trend[i] = 0
+            elif r <= -1:
+                trend[i] = 1
+        return rate, trend
+
+else:
+
+    def _rate_and_trend(timestamps_ns: np.ndarray, glucose: np.ndarray):
+        """Rate of change (mg/dL per minute) and trend code, vectorized."""
+        rate = np.full(glucose.shape[0], np.nan)
+        minutes = np.diff(timestamps_ns) / NS_PER_MINUTE
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate[1:] = np.where(minutes > 0, np.diff(glucose) / minutes, np.nan)
+        trend = np.select(
+            [rate > 2, rate >= 1, rate < -2, rate <= -1], [4, 3, 0, 1], default=2
+        ).astype(np.int8)
+        return rate, trend
+
 
 class LibreGlucoseProcessor:
     """Processor for Freestyle Libre 3 glucose data."""
 
+    # Common column name mappings for Libre data
+    COLUMN_MAPPINGS = {
+        # Timestamp columns
+        "Device Timestamp": "timestamp",
+        "Timestamp (YYYY-MM-DD HH:MM:SS)": "timestamp",
+        "Time": "timestamp",
+        "Date": "date",
+        # Glucose value columns
+        "Historic Glucose mg/dL": "glucose_mg_dl",
+        "Historic Glucose (mg/dL)": "glucose_mg_dl",
+        "Historic Glucose mmol/L": "glucose_mmol_l",
+        "Glucose Value (mg/dL)": "glucose_mg_dl",
+        "Glucose Value (mmol/L)": "glucose_mmol_l",
+        "Record Type": "record_type",
+        # Scan glucose (real-time readings)
+        "Scan Glucose mg/dL": "scan_glucose_mg_dl",
+        "Scan Glucose (mg/dL)": "scan_glucose_mg_dl",
+        "Scan Glucose mmol/L": "scan_glucose_mmol_l",
+        # Strip glucose (fingerstick readings)
+        "Strip Glucose mg/dL": "strip_glucose_mg_dl",
+        "Strip Glucose (mg/dL)": "strip_glucose_mg_dl",
+        "Strip Glucose mmol/L": "strip_glucose_mmol_l",
+        # Additional fields
+        "Notes": "notes",
+        "Serial Number": "serial_number",
+        "Device": "device",
+        "Ketone mmol/L": "ketone_mmol_l",
+        "Rapid-Acting Insulin (units)": "rapid_acting_insulin_units",
+        "Carbohydrates (grams)": "carbohydrates_grams",
+        "Long-Acting Insulin (units)": "long_acting_insulin_units",
+    }
+
+    # Standardized columns used by processing; everything else is skipped on load
+    PROCESSED_COLUMNS = {
+        "timestamp",
+        "glucose_mg_dl",
+        "glucose_mmol_l",
+        "record_type",
+        "scan_glucose_mg_dl",
+        "strip_glucose_mg_dl",
+    }
+
+    # Explicit dtypes so pandas does not have to infer them
+    COLUMN_DTYPES = {
+        "record_type": "Int8",
+        "glucose_mg_dl": "float32",
+        "glucose_mmol_l": "float32",
+        "scan_glucose_mg_dl": "float32",
+        "strip_glucose_mg_dl": "float32",
+    }
+
+    TREND_CATEGORIES = ["falling_fast", "falling", "stable", "rising", "rising_fast"]
+
+    # Timestamp formats seen in Libre exports, tried in order
+    TIMESTAMP_FORMATS = [
+        "%d-%m-%Y %H:%M",
+        "%m-%d-%Y %H:%M",
+        "%m-%d-%Y %I:%M %p",
+        "%Y-%m-%d %H:%M:%S",
+        "%Y-%m-%d %H:%M",
+    ]
+
     def __init__(self, csv_file_path: str):
         """
         Initialize the processor with the path to the Libre CSV file.
@@ -37,9 +159,22 @@ class LibreGlucoseProcessor:
 
             for encoding in encodings:
                 try:
-                    self.raw_data = pd.read_csv(
-                        self.csv_file_path, encoding=encoding, skiprows=1
-                    )
+                    # The first line is export metadata; the header is on line two
+                    header = pd.read_csv(
+                        self.csv_file_path, encoding=encoding, header=1, nrows=0
+                    ).columns
+                    usecols = [
+                        col
+                        for col in header
+                        if self.COLUMN_MAPPINGS.get(col) in self.PROCESSED_COLUMNS
+                    ]
+                    dtypes = {
+                        col: self.COLUMN_DTYPES[self.COLUMN_MAPPINGS[col]]
+                        for col in usecols
+                        if self.COLUMN_MAPPINGS[col] in self.COLUMN_DTYPES
+                    }
+
+                    self.raw_data = self._read_csv(encoding, usecols, dtypes)
                     logging.info(f"Successfully loaded CSV with {encoding} encoding")
                     break
                 except UnicodeDecodeError:
@@ -62,6 +197,59 @@ class LibreGlucoseProcessor:
             logging.error(f"Error loading CSV file: {e}")
             return False
 
+    def _read_csv(
+        self, encoding: str, usecols: List[str], dtypes: Dict[str, str]
+    ) -> pd.DataFrame:
+        """
+        Read the Libre CSV body, using Arrow's multithreaded reader when available.
+
+        Args:
+            encoding (str): File encoding
+            usecols (List[str]): Columns to read; all columns if empty
+            dtypes (Dict[str, str]): Pandas dtypes keyed by column name
+
+        Returns:
+            pd.DataFrame: Raw glucose data
+        """
+        if not HAS_PYARROW:
+            return pd.read_csv(
+                self.csv_file_path,
+                encoding=encoding,
+                header=1,
+                # Unrecognized layout: load everything so the missing
+                # column warning in standardize_columns can fire
+                usecols=usecols or None,
+                dtype=dtypes,
+            )
+
+        # Nullable "Int8" maps to Arrow int8; nulls are restored below
+        column_types = {
+            col: pa.from_numpy_dtype(np.dtype(dtype.lower()))
+            for col, dtype in dtypes.items()
+        }
+        # Keep timestamps as text, as the pandas reader does, so they are
+        # parsed with the detected format rather than Arrow's own inference
+        column_types.update(
+            {
+                col: pa.string()
+                for col in usecols
+                if self.COLUMN_MAPPINGS[col] == "timestamp"
+            }
+        )
+
+        table = pa_csv.read_csv(
+            self.csv_file_path,
+            read_options=pa_csv.ReadOptions(skip_rows=1, encoding=encoding),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=usecols, column_types=column_types
+            ),
+        )
+
+        return table.to_pandas(
+            types_mapper={pa.int8(): pd.Int8Dtype()}.get,
+            deduplicate_objects=True,
+        )
+
     def standardize_columns(self) -> None:
         """
         Standardize column names to a consistent format.
@@ -70,40 +258,8 @@ class LibreGlucoseProcessor:
         if self.raw_data is None:
             raise ValueError("CSV file not loaded. Call load_csv() first.")
 
-        # Common column name mappings for Libre data
-        column_mappings = {
-            # Timestamp columns
-            "Device Timestamp": "timestamp",
-            "Timestamp (YYYY-MM-DD HH:MM:SS)": "timestamp",
-            "Time": "timestamp",
-            "Date": "date",
-            # Glucose value columns
-            "Historic Glucose mg/dL": "glucose_mg_dl",
-            "Historic Glucose (mg/dL)": "glucose_mg_dl",
-            "Historic Glucose mmol/L": "glucose_mmol_l",
-            "Glucose Value (mg/dL)": "glucose_mg_dl",
-            "Glucose Value (mmol/L)": "glucose_mmol_l",
-            "Record Type": "record_type",
-            # Scan glucose (real-time readings)
-            "Scan Glucose mg/dL": "scan_glucose_mg_dl",
-            "Scan Glucose (mg/dL)": "scan_glucose_mg_dl",
-            "Scan Glucose mmol/L": "scan_glucose_mmol_l",
-            # Strip glucose (fingerstick readings)
-            "Strip Glucose mg/dL": "strip_glucose_mg_dl",
-            "Strip Glucose (mg/dL)": "strip_glucose_mg_dl",
-            "Strip Glucose mmol/L": "strip_glucose_mmol_l",
-            # Additional fields
-            "Notes": "notes",
-            "Serial Number": "serial_number",
-            "Device": "device",
-            "Ketone mmol/L": "ketone_mmol_l",
-            "Rapid-Acting Insulin (units)": "rapid_acting_insulin_units",
-            "Carbohydrates (grams)": "carbohydrates_grams",
-            "Long-Acting Insulin (units)": "long_acting_insulin_units",
-        }
-
         # Apply mappings
-        self.raw_data.rename(columns=column_mappings, inplace=True)
+        self.raw_data.rename(columns=self.COLUMN_MAPPINGS, inplace=True)
 
         # Ensure we have required columns
         required_columns = ["timestamp", "glucose_mg_dl"]
@@ -130,40 +286,107 @@ class LibreGlucoseProcessor:
 
         # Convert timestamp to datetime
         if "timestamp" in df.columns:
-            df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+            if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+                timestamps = self._parse_timestamps(df["timestamp"])
+                unparsed = int((timestamps.isna() & df["timestamp"].notna()).sum())
+                if unparsed:
+                    logging.warning(
+                        f"Dropping {unparsed} rows with unparseable timestamps"
+                    )
+                df["timestamp"] = timestamps
+            df = df.dropna(subset=["timestamp"])
 
         # Handle glucose values - convert to mg/dL if in mmol/L
         if "glucose_mmol_l" in df.columns and "glucose_mg_dl" not in df.columns:
             df["glucose_mg_dl"] = df["glucose_mmol_l"] * 18.0182  # Conversion factor
 
-        # Combine different glucose reading types
-        glucose_columns = ["glucose_mg_dl", "scan_glucose_mg_dl", "strip_glucose_mg_dl"]
-        df["glucose_value"] = df[glucose_columns].bfill(axis=1).iloc[:, 0]
+        # Combine different glucose reading types (historic, then scan, then strip)
+        missing = np.full(len(df), np.nan, dtype=np.float32)
+        historic, scan, strip = (
+            (
+                df[col].to_numpy(dtype=np.float32, na_value=np.nan)
+                if col in df.columns
+                else missing
+            )
+            for col in ["glucose_mg_dl", "scan_glucose_mg_dl", "strip_glucose_mg_dl"]
+        )
+        has_scan = ~np.isnan(scan)
+        has_strip = ~np.isnan(strip)
+        df["glucose_value"] = np.where(
+            ~np.isnan(historic), historic, np.where(has_scan, scan, strip)
+        )
 
         # Add glucose source information
-        df["glucose_source"] = "historic"
-        if "scan_glucose_mg_dl" in df.columns:
-            df.loc[df["scan_glucose_mg_dl"].notna(), "glucose_source"] = "scan"
-        if "strip_glucose_mg_dl" in df.columns:
-            df.loc[df["strip_glucose_mg_dl"].notna(), "glucose_source"] = "fingerstick"
+        df["glucose_source"] = np.select(
+            [has_strip, has_scan], ["fingerstick", "scan"], default="historic"
+        )
+
+        # Sort by timestamp; a stable sort keeps file order among duplicates
+        df = df.sort_values("timestamp", kind="mergesort")
 
         # Remove invalid readings
-        df = df[df["glucose_value"].between(20, 600)]  # Reasonable glucose range
+        glucose_values = df["glucose_value"].to_numpy()
+        valid = np.flatnonzero(
+            (glucose_values >= 20) & (glucose_values <= 600)
+        )  # Reasonable glucose range
 
-        # Remove duplicate timestamps
-        df = df.drop_duplicates(subset=["timestamp"])
+        # Remove duplicate timestamps, keeping the first valid reading
+        timestamps = df["timestamp"].to_numpy().view("i8")[valid]
+        first = np.ones(len(valid), dtype=bool)
+        first[1:] = timestamps[1:] != timestamps[:-1]
 
-        # Sort by timestamp
-        df = df.sort_values("timestamp")
+        df = df.iloc[valid[first]]
 
         # Add derived features
         df = self._add_glucose_metrics(df)
+        df = optimize_dtypes(df)
 
         self.processed_data = df
 
         logging.info(f"Processed {len(df)} valid glucose records")
         return df
 
+    def _parse_timestamps(
+        self, timestamps: pd.Series, sample_size: int = 1000
+    ) -> pd.Series:
+        """
+        Parse raw timestamp strings with the export's timestamp format.
+
+        Formats in TIMESTAMP_FORMATS are screened against a sample first, but
+        one is only used if it parses every non-null value in the column. A
+        sample can match the wrong format, e.g. month-first dates read as
+        day-first while every day in the sample is 12 or less.
+
+        Args:
+            timestamps (pd.Series): Raw timestamp strings
+            sample_size (int): Number of non-null values to screen formats with
+
+        Returns:
+            pd.Series: Parsed timestamps; NaT where a value could not be parsed
+        """
+        present = timestamps.notna()
+        sample = timestamps[present].head(sample_size)
+
+        if not sample.empty:
+            for timestamp_format in self.TIMESTAMP_FORMATS:
+                try:
+                    pd.to_datetime(sample, format=timestamp_format, exact=True)
+                except (ValueError, TypeError):
+                    continue
+
+                parsed = pd.to_datetime(
+                    timestamps,
+                    format=timestamp_format,
+                    exact=True,
+                    cache=True,
+                    errors="coerce",
+                )
+                if not (parsed.isna() & present).any():
+                    return parsed
+
+        logging.warning("Unrecognized timestamp format, falling back to inference")
+        return pd.to_datetime(timestamps, errors="coerce")
+
     def _add_glucose_metrics(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Add derived glucose metrics to the dataframe.
@@ -174,29 +397,35 @@ class LibreGlucoseProcessor:
         Returns:
             pd.DataFrame: DataFrame with additional metrics
         """
-        # Calculate glucose rate of change
-        df["glucose_rate_change"] = (
-            df["glucose_value"].diff() / df["timestamp"].diff().dt.total_seconds() * 60
+        # Calculate glucose rate of change and trend categories in one pass
+        rate_change, trend_codes = _rate_and_trend(
+            df["timestamp"].to_numpy(dtype="datetime64[ns]").view("i8"),
+            df["glucose_value"].to_numpy(dtype=np.float64),
+        )
+        df["glucose_rate_change"] = rate_change
+        df["glucose_trend"] = pd.Categorical.from_codes(
+            trend_codes, categories=self.TREND_CATEGORIES
         )
-
-        # Add glucose trend categories
-        df["glucose_trend"] = "stable"
-        df.loc[df["glucose_rate_change"] > 2, "glucose_trend"] = "rising_fast"
-        df.loc[df["glucose_rate_change"].between(1, 2), "glucose_trend"] = "rising"
-        df.loc[df["glucose_rate_change"].between(-1, -2), "glucose_trend"] = "falling"
-        df.loc[df["glucose_rate_change"] < -2, "glucose_trend"] = "falling_fast"
 
         # Add time-based features
-        df["hour"] = df["timestamp"].dt.hour
-        df["day_of_week"] = df["timestamp"].dt.dayofweek
-        df["is_weekend"] = df["day_of_week"].isin([5, 6])
+        hours, days = hour_and_day_of_week(df["timestamp"])
+        df["hour"] = hours
+        df["day_of_week"] = days
+        df["is_weekend"] = days >= 5
 
         # Add glucose range categories
-        df["glucose_range"] = "normal"
-        df.loc[df["glucose_value"] < 70, "glucose_range"] = "low"
-        df.loc[df["glucose_value"] > 180, "glucose_range"] = "high"
-        df.loc[df["glucose_value"] < 54, "glucose_range"] = "very_low"
-        df.loc[df["glucose_value"] > 250, "glucose_range"] = "very_high"
+        glucose_values = df["glucose_value"].to_numpy()
+        range_conditions = [
+            glucose_values < 54,
+            glucose_values < 70,
+            glucose_values > 250,
+            glucose_values > 180,
+        ]
+        range_choices = ["very_low", "low", "very_high", "high"]
+        df["glucose_range"] = pd.Categorical(
+            np.select(range_conditions, range_choices, default="normal"),
+            categories=["very_low", "low", "normal", "high", "very_high"],
+        )
 
         return df
 
@@ -211,43 +440,36 @@ class LibreGlucoseProcessor:
             raise ValueError("Data not processed. Call clean_and_process() first.")
 
         df = self.processed_data
-        total_readings = len(df)
 
-        if total_readings == 0:
+        if len(df) == 0:
             return {}
 
+        range_percent = df["glucose_range"].value_counts(normalize=True) * 100
+        # Summarize in float64; the column itself is stored as float32
+        glucose_summary = df["glucose_value"].astype("float64").agg(["mean", "std"])
+
         stats = {
-            "time_very_low_percent": (df["glucose_range"] == "very_low").sum()
-            / total_readings
-            * 100,
-            "time_low_percent": (df["glucose_range"] == "low").sum()
-            / total_readings
-            * 100,
-            "time_in_range_percent": (df["glucose_range"] == "normal").sum()
-            / total_readings
-            * 100,
-            "time_high_percent": (df["glucose_range"] == "high").sum()
-            / total_readings
-            * 100,
-            "time_very_high_percent": (df["glucose_range"] == "very_high").sum()
-            / total_readings
-            * 100,
-            "average_glucose": df["glucose_value"].mean(),
-            "glucose_std": df["glucose_value"].std(),
+            "time_very_low_percent": range_percent.get("very_low", 0.0),
+            "time_low_percent": range_percent.get("low", 0.0),
+            "time_in_range_percent": range_percent.get("normal", 0.0),
+            "time_high_percent": range_percent.get("high", 0.0),
+            "time_very_high_percent": range_percent.get("very_high", 0.0),
+            "average_glucose": glucose_summary["mean"],
+            "glucose_std": glucose_summary["std"],
             "coefficient_variation": (
-                df["glucose_value"].std() / df["glucose_value"].mean()
+                glucose_summary["std"] / glucose_summary["mean"]
             )
             * 100,
         }
 
         return stats
 
-    def resample_data(self, frequency: str = "15T") -> pd.DataFrame:
+    def resample_data(self, frequency: str = "15min") -> pd.DataFrame:
         """
         Resample glucose data to a specified frequency.
 
         Args:
-            frequency (str): Pandas frequency string (e.g., '15T' for 15 minutes)
+            frequency (str): Pandas frequency string (e.g., '15min' for 15 minutes)
 
         Returns:
             pd.DataFrame: Resampled glucose data
@@ -263,12 +485,41 @@ class LibreGlucoseProcessor:
         resampled = df[numeric_columns].resample(frequency).mean()
 
         # Forward fill missing values (within reason)
-        resampled = resampled.fillna(method="ffill", limit=2)
+        resampled = self._forward_fill(resampled, limit=2)
 
         resampled.reset_index(inplace=True)
 
         return resampled
 
+    @staticmethod
+    def _forward_fill(df: pd.DataFrame, limit: int) -> pd.DataFrame:
+        """
+        Forward fill NaNs in numeric columns, filling at most `limit` in a row.
+
+        Equivalent to df.ffill(limit=limit), done with one positional
+        accumulate over all columns.
+
+        Args:
+            df (pd.DataFrame): Numeric DataFrame
+            limit (int): Maximum number of consecutive NaNs to fill
+
+        Returns:
+            pd.DataFrame: Forward-filled DataFrame
+        """
+        values = df.to_numpy(dtype=np.float64)
+        rows = np.arange(values.shape[0])[:, None]
+
+        # Row of the most recent valid value at or before each position
+        last_valid = np.where(np.isnan(values), 0, rows)
+        np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+
+        filled = values[last_valid, np.arange(values.shape[1])]
+        filled[rows - last_valid > limit] = np.nan
+
+        return pd.DataFrame(filled, index=df.index, columns=df.columns).astype(
+            df.dtypes.to_dict()
+        )
+
 
 if __name__ == "__main__":
     # Example usage
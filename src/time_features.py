@@ -0,0 +1,41 @@
+"""
+Time Feature Helpers
+
+This module derives calendar features from timestamp columns directly from the
+underlying int64 representation, avoiding repeated pandas .dt accessor passes.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Tuple
+
+NS_PER_HOUR = 3_600_000_000_000
+NS_PER_DAY = 86_400_000_000_000
+
+# 1970-01-01 was a Thursday (Monday=0)
+EPOCH_DAY_OF_WEEK = 3
+
+
+def hour_and_day_of_week(timestamps: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute hour of day and day of week for a datetime series.
+
+    Timezone-aware series use their local wall-clock time, matching .dt.hour
+    and .dt.dayofweek. The series must not contain NaT.
+
+    Args:
+        timestamps (pd.Series): Datetime series
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: int8 arrays of hours (0-23) and
+            days of week (Monday=0)
+    """
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+
+    ns = timestamps.to_numpy(dtype="datetime64[ns]").view("i8")
+
+    hours = ((ns // NS_PER_HOUR) % 24).astype(np.int8)
+    days = (((ns // NS_PER_DAY) + EPOCH_DAY_OF_WEEK) % 7).astype(np.int8)
+
+    return hours, days
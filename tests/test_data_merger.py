@@ -0,0 +1,85 @@
+"""
+Tests for the Apple Health / Libre data merger.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+import data_merger  # noqa: E402
+from data_merger import HealthDataMerger  # noqa: E402
+from glucose_processor import LibreGlucoseProcessor  # noqa: E402
+
+
+@pytest.fixture
+def glucose_data(tmp_path):
+    rng = np.random.default_rng(0)
+    timestamps = pd.date_range("2024-03-01", periods=2000, freq="15min")
+    glucose = np.clip(110 + np.cumsum(rng.normal(0, 6, len(timestamps))), 40, 300)
+
+    lines = [
+        "Glucose Data,Generated on,01-04-2024 10:00 UTC,Generated by,user",
+        "Device,Serial Number,Device Timestamp,Record Type,Historic Glucose mg/dL",
+    ]
+    lines += [
+        f"FreeStyle LibreLink,ABC,{timestamp:%d-%m-%Y %H:%M},0,{value:.0f}"
+        for timestamp, value in zip(timestamps, glucose)
+    ]
+    csv_file_path = tmp_path / "libre.csv"
+    csv_file_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    processor = LibreGlucoseProcessor(str(csv_file_path))
+    assert processor.load_csv()
+    return processor.clean_and_process()
+
+
+@pytest.fixture
+def apple_health_data(glucose_data):
+    rng = np.random.default_rng(1)
+    # Every 7.5 minutes, so every other record is equidistant from two readings
+    start_dates = pd.date_range(
+        glucose_data["timestamp"].min() - pd.Timedelta(hours=1),
+        periods=3000,
+        freq="450s",
+        unit=glucose_data["timestamp"].dt.unit,
+    )
+    # Dictionary-encoded in order of first appearance, as the parser emits it
+    types = pd.Categorical(
+        rng.choice(["StepCount", "HeartRate", "ActiveEnergyBurned"], len(start_dates)),
+        categories=["StepCount", "HeartRate", "ActiveEnergyBurned"],
+    )
+    return pd.DataFrame(
+        {
+            "type": types,
+            "value": rng.normal(80, 20, len(start_dates)),
+            "startDate": start_dates,
+        }
+    )
+
+
+def run_merge(monkeypatch, use_polars, glucose_data, apple_health_data):
+    monkeypatch.setattr(data_merger, "HAS_POLARS", use_polars)
+    merger = HealthDataMerger()
+    merger.load_glucose_data(glucose_data)
+    merger.load_apple_health_data(apple_health_data)
+    merged = merger.align_timestamps(tolerance_minutes=15)
+    return merged.reset_index(drop=True), merger.create_time_windows(60)
+
+
+@pytest.mark.skipif(not data_merger.HAS_POLARS, reason="polars is not installed")
+def test_polars_alignment_matches_pandas(monkeypatch, glucose_data, apple_health_data):
+    pandas_merged, pandas_windows = run_merge(
+        monkeypatch, False, glucose_data, apple_health_data
+    )
+    polars_merged, polars_windows = run_merge(
+        monkeypatch, True, glucose_data, apple_health_data
+    )
+
+    # Includes dtypes and the category order of every categorical column
+    pd.testing.assert_frame_equal(polars_merged, pandas_merged)
+    pd.testing.assert_frame_equal(polars_windows, pandas_windows)
@@ -0,0 +1,148 @@
+"""
+Tests for the Apple Health XML parser.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from data_parser import (  # noqa: E402
+    ET,
+    HAS_PYARROW,
+    AppleHealthParser,
+    _parse_record_chunk,
+)
+
+
+def write_export(path: Path, n_entries: int = 3000) -> None:
+    """Write a synthetic export with Records nested in Correlations throughout."""
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<HealthData locale="en_US">',
+        ' <ExportDate value="2024-01-01 00:00:00 +0000"/>',
+    ]
+    for i in range(n_entries):
+        start = f"2024-01-01 {i % 24:02d}:{i % 60:02d}:00 +0000"
+        if i % 7 == 0:
+            lines.append(f' <Correlation type="BloodPressure" startDate="{start}">')
+            for kind in ("Systolic", "Diastolic"):
+                lines.append(
+                    f'  <Record type="HKQuantityTypeIdentifierBloodPressure{kind}"'
+                    f' sourceName="Cuff" value="{80 + i % 40}" startDate="{start}"/>'
+                )
+            lines.append(" </Correlation>")
+        elif i % 11 == 0:
+            lines.append(
+                f' <Workout workoutActivityType="Running" duration="{i}"'
+                f' startDate="{start}"/>'
+            )
+        else:
+            if i % 13 == 0:
+                record_type = "HKQuantityTypeIdentifierBloodGlucose"
+            elif i % 17 == 0:
+                record_type = "HKCategoryTypeIdentifierSleepAnalysis"
+            elif i % 5 == 0:
+                record_type = "HKQuantityTypeIdentifierStepCount"
+            else:
+                record_type = "HKQuantityTypeIdentifierHeartRate"
+            lines.append(
+                f' <Record type="{record_type}"'
+                f' sourceName="Watch" value="{60 + i % 50}" startDate="{start}">'
+            )
+            lines.append(
+                '  <MetadataEntry key="HKMetadataKeyHeartRateMotionContext"'
+                ' value="0"/>'
+            )
+            lines.append(" </Record>")
+    lines.append("</HealthData>")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+@pytest.fixture
+def parser(tmp_path):
+    xml_file_path = tmp_path / "export.xml"
+    write_export(xml_file_path)
+    parser = AppleHealthParser(str(xml_file_path))
+    assert parser.load_xml()
+    return parser
+
+
+def test_load_xml_rejects_truncated_export(tmp_path):
+    xml_file_path = tmp_path / "export.xml"
+    write_export(xml_file_path)
+    content = xml_file_path.read_bytes()
+    xml_file_path.write_bytes(content[: len(content) // 2])
+
+    assert not AppleHealthParser(str(xml_file_path)).load_xml()
+
+
+def test_load_xml_defers_other_parse_errors_to_extraction(tmp_path):
+    xml_file_path = tmp_path / "export.xml"
+    write_export(xml_file_path)
+    content = xml_file_path.read_bytes()
+    middle = content.index(b"<Record ", len(content) // 2)
+    xml_file_path.write_bytes(content[:middle] + b"<Record <" + content[middle:])
+
+    parser = AppleHealthParser(str(xml_file_path))
+    assert parser.load_xml()
+    with pytest.raises(ET.ParseError):
+        parser.extract_health_records(n_jobs=1)
+
+
+def test_extract_includes_records_nested_in_correlations(parser):
+    records = parser.extract_health_records(n_jobs=1)
+
+    counts = records["type"].value_counts()
+    assert counts["HKQuantityTypeIdentifierBloodPressureSystolic"] == 429
+    assert counts["HKQuantityTypeIdentifierBloodPressureDiastolic"] == 429
+    assert len(parser.extract_workouts()) == 234
+
+
+@pytest.mark.skipif(not HAS_PYARROW, reason="parallel parsing requires pyarrow")
+@pytest.mark.parametrize("n_jobs", [2, 3, 7])
+def test_parallel_extract_matches_serial(parser, n_jobs):
+    assert len(parser._record_chunk_offsets(n_jobs)) > 1
+
+    serial = parser.extract_health_records(n_jobs=1)
+    parallel = parser.extract_health_records(n_jobs=n_jobs)
+
+    assert len(parallel) == len(serial)
+    assert parallel.astype(str).equals(serial.astype(str))
+
+
+@pytest.mark.skipif(not HAS_PYARROW, reason="parallel parsing requires pyarrow")
+def test_record_chunks_start_outside_correlations(parser):
+    content = Path(parser.xml_file_path).read_bytes()
+
+    for start, _ in parser._record_chunk_offsets(16)[1:]:
+        assert content.startswith(b"<Record ", start)
+        preceding = content[:start]
+        assert preceding.count(b"<Correlation ") == preceding.count(
+            b"</Correlation>"
+        )
+
+
+@pytest.mark.skipif(not HAS_PYARROW, reason="parallel parsing requires pyarrow")
+def test_record_chunk_with_unbalanced_tags_raises(tmp_path):
+    # A range cut inside a Correlation must fail rather than drop records
+    xml_file_path = tmp_path / "chunk.xml"
+    xml_file_path.write_bytes(b'<Record a="1"/></Correlation><Record a="2"/>')
+
+    with pytest.raises(ET.ParseError):
+        _parse_record_chunk(str(xml_file_path), 0, xml_file_path.stat().st_size, None)
+
+
+@pytest.mark.parametrize(
+    "method", ["get_glucose_data", "get_activity_data", "get_sleep_data"]
+)
+def test_get_data_from_extracted_records_matches_streaming(parser, method):
+    records = parser.extract_health_records(n_jobs=1)
+
+    streamed = getattr(parser, method)()
+    filtered = getattr(parser, method)(records)
+
+    pd.testing.assert_frame_equal(filtered, streamed)
@@ -0,0 +1,47 @@
+"""
+Tests for the FreeStyle Libre glucose processor.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from glucose_processor import LibreGlucoseProcessor  # noqa: E402
+
+
+def write_libre_csv(path: Path, timestamps: pd.DatetimeIndex, timestamp_format: str):
+    """Write a minimal Libre export with one historic reading per timestamp."""
+    lines = [
+        "Glucose Data,Generated on,01-04-2024 10:00 UTC,Generated by,user",
+        "Device,Serial Number,Device Timestamp,Record Type,Historic Glucose mg/dL",
+    ]
+    for i, timestamp in enumerate(timestamps):
+        lines.append(
+            f"FreeStyle LibreLink,ABC,{timestamp.strftime(timestamp_format)},0,"
+            f"{90 + i % 60}"
+        )
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+@pytest.mark.parametrize(
+    "timestamp_format",
+    ["%d-%m-%Y %H:%M", "%m-%d-%Y %H:%M", "%m-%d-%Y %I:%M %p", "%Y-%m-%d %H:%M:%S"],
+)
+def test_clean_and_process_keeps_every_reading(tmp_path, timestamp_format):
+    # Starting on the 1st, the first 1000 readings at 15-minute cadence only
+    # cover days 1-11, which also parse as day-first dates
+    timestamps = pd.date_range("2024-03-01", periods=3000, freq="15min")
+    csv_file_path = tmp_path / "libre.csv"
+    write_libre_csv(csv_file_path, timestamps, timestamp_format)
+
+    processor = LibreGlucoseProcessor(str(csv_file_path))
+    assert processor.load_csv()
+    df = processor.clean_and_process()
+
+    assert len(df) == len(timestamps)
+    assert df["timestamp"].min() == timestamps[0]
+    assert df["timestamp"].max() == timestamps[-1]